@@ -1,8 +1,26 @@
-from fastapi import FastAPI, HTTPException, Query, status
+from fastapi import FastAPI, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse
+import orjson
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.decorator import cache
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
-import uuid
+from operator import attrgetter
+import logging
+import logging.handlers
+import queue
+import numpy as np
+
+try:
+    # Rust-реализация UUID — в разы быстрее стандартной библиотеки
+    from fastuuid import UUID, uuid4, uuid4_as_strings_bulk
+except ImportError:
+    from uuid import UUID, uuid4
+
+    def uuid4_as_strings_bulk(count: int) -> list:
+        return [str(uuid4()) for _ in range(count)]
 
 # ========== МОДЕЛЬ ДАННЫХ ==========
 class Trip(BaseModel):
@@ -31,17 +49,36 @@ class Trip(BaseModel):
             }
         }
 
+class TripPatch(BaseModel):
+    """Модель частичного обновления поездки: все поля необязательны.
+
+    Служебных полей (id, created_at, updated_at) здесь нет намеренно —
+    клиент не может их изменить, а значения проходят ту же валидацию
+    типов, что и при создании.
+    """
+    destination: Optional[str] = None
+    country: Optional[str] = None
+    travel_agency: Optional[str] = None
+    duration_days: Optional[int] = None
+    price: Optional[float] = None
+    rating: Optional[float] = None
+    group_size: Optional[int] = None
+
 # ========== ПРИЛОЖЕНИЕ FASTAPI ==========
 app = FastAPI(
     title="API Туристических поездок",
     description="Лабораторная работа №4. Веб-сервис для управления туристическими поездками",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    # orjson сериализует ответы в несколько раз быстрее стандартного json
+    default_response_class=ORJSONResponse
 )
 
 # ========== БАЗА ДАННЫХ В ПАМЯТИ ==========
-trips_db = []
+# Ключи — 16-байтовые объекты UUID: вдвое компактнее 36-символьных строк,
+# хешируются и сравниваются быстрее; наружу отдаётся строковый trip.id
+trips_db: dict = {}
 STATIC_TRIPS = [
     {
         "destination": "Париж",
@@ -90,80 +127,241 @@ STATIC_TRIPS = [
     }
 ]
 
+# Кэш отсортированных представлений: ключ (поле, по убыванию) -> список поездок
+_sorted_views: dict = {}
+
+# Заранее приведённые к нижнему регистру поля для поиска: ключ -> (destination, country)
+_search_lc: dict = {}
+
+# Числовые поля модели, по которым считается статистика
+_NUMERIC_FIELDS = ('duration_days', 'price', 'rating', 'group_size')
+
+# Поля, по которым разрешена сортировка в GET /trips
+_SORTABLE_FIELDS = frozenset({
+    'destination', 'country', 'travel_agency',
+    'duration_days', 'price', 'rating', 'group_size'
+})
+
+# Колонки числовых полей (структура массивов вместо массива структур):
+# буферы растут удвоением, фактическая длина — _cols_len
+_INITIAL_CAPACITY = 16
+_cols = {
+    'duration_days': np.empty(_INITIAL_CAPACITY, np.int64),
+    'price': np.empty(_INITIAL_CAPACITY, np.float64),
+    'rating': np.empty(_INITIAL_CAPACITY, np.float64),
+    'group_size': np.empty(_INITIAL_CAPACITY, np.int64)
+}
+_cols_len = 0
+_col_row: dict = {}   # ключ поездки -> номер строки в колонках
+_row_keys: list = []  # номер строки -> ключ поездки
+
+# ========== ЛОГИРОВАНИЕ ==========
+# print() в обработчиках сериализовал бы воркеры на блокировке stdout;
+# пишем через очередь — ввод-вывод выполняет отдельный поток слушателя
+logger = logging.getLogger("trips")
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
+def _setup_logging():
+    """Настроить логирование через очередь с выводом в отдельном потоке"""
+    global _log_listener
+
+    if logger.handlers:
+        return
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+
+    _log_listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _log_listener.start()
+
 # ========== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==========
+def _invalidate_views():
+    """Сбросить кэш сортировок после изменения базы данных"""
+    _sorted_views.clear()
+
+async def _invalidate_response_cache():
+    """Сбросить кэш готовых ответов после изменения базы данных"""
+    await FastAPICache.clear(namespace="trips")
+
+def _parse_trip_id(trip_id: str):
+    """Преобразовать строковый ID из пути во внутренний ключ UUID"""
+    try:
+        return UUID(trip_id)
+    except ValueError:
+        # Некорректная строка — такой поездки заведомо нет
+        return None
+
+def _store_trip(trip: Trip):
+    """Положить поездку в базу и обновить производные структуры.
+
+    Всё, что может завершиться ошибкой, вычисляется до первой записи:
+    упавшая запись не должна оставлять базу и кэши рассинхронизированными.
+    """
+    global _cols_len
+
+    key = UUID(trip.id)
+    search_pair = (trip.destination.lower(), trip.country.lower())
+    duration = int(trip.duration_days)
+    price = float(trip.price)
+    rating = float(trip.rating)
+    group_size = int(trip.group_size)
+
+    # Дальше только безопасные записи.
+    # Числовые поля идут в колонки (новая строка или перезапись старой)
+    row = _col_row.get(key)
+    if row is None:
+        if _cols_len == _cols['price'].size:
+            # Буферы заполнены — удваиваем ёмкость
+            for field in _NUMERIC_FIELDS:
+                _cols[field] = np.resize(_cols[field], _cols_len * 2)
+        row = _cols_len
+        _col_row[key] = row
+        _row_keys.append(key)
+        _cols_len += 1
+
+    _cols['duration_days'][row] = duration
+    _cols['price'][row] = price
+    _cols['rating'][row] = rating
+    _cols['group_size'][row] = group_size
+
+    _search_lc[key] = search_pair
+    trips_db[key] = trip
+    _invalidate_views()
+
+def _remove_trip(trip_id: str) -> Optional[Trip]:
+    """Убрать поездку из базы и производных структур"""
+    global _cols_len
+
+    key = _parse_trip_id(trip_id)
+    trip = trips_db.pop(key, None) if key is not None else None
+
+    if trip is not None:
+        _search_lc.pop(key, None)
+
+        # Переносим последнюю строку колонок на место удаляемой
+        row = _col_row.pop(key)
+        last = _cols_len - 1
+        if row != last:
+            last_key = _row_keys[last]
+            for field in _NUMERIC_FIELDS:
+                _cols[field][row] = _cols[field][last]
+            _row_keys[row] = last_key
+            _col_row[last_key] = row
+        _row_keys.pop()
+        _cols_len -= 1
+
+        _invalidate_views()
+
+    return trip
+
 def get_current_time():
     """Возвращает текущее время в строковом формате"""
-    return datetime.now().isoformat()
+    # timespec='seconds' — без форматирования микросекунд, быстрее и короче
+    return datetime.now().isoformat(timespec='seconds')
 
-def initialize_database():
-    """Инициализация базы данных начальными значениями"""
-    global trips_db
-    trips_db.clear()
-    
-    for trip_data in STATIC_TRIPS:
-        trip_id = str(uuid.uuid4())
-        now = get_current_time()
-        trip = Trip(
+def bulk_create_trips(items: List[dict]) -> List[Trip]:
+    """Массовая загрузка доверенных записей (инициализация, импорт).
+
+    Все накладные расходы на запись амортизируются по пакету: ID
+    генерируются одним вызовом, момент времени общий, модели собираются
+    через model_construct без валидации Pydantic.
+    """
+    trip_ids = uuid4_as_strings_bulk(len(items))
+    now = get_current_time()
+
+    created = []
+    for trip_id, trip_data in zip(trip_ids, items):
+        trip = Trip.model_construct(
             **trip_data,
             id=trip_id,
             created_at=now,
             updated_at=now
         )
-        trips_db.append(trip)
+        _store_trip(trip)
+        created.append(trip)
+
+    return created
+
+def initialize_database():
+    """Инициализация базы данных начальными значениями"""
+    global trips_db, _cols_len
+    trips_db.clear()
+    _search_lc.clear()
+    _col_row.clear()
+    _row_keys.clear()
+    _cols_len = 0
+
+    bulk_create_trips(STATIC_TRIPS)
 
 def find_trip_by_id(trip_id: str) -> Optional[Trip]:
-    """Найти поездку по ID"""
-    for trip in trips_db:
-        if trip.id == trip_id:
-            return trip
-    return None
-
-def find_trip_index(trip_id: str) -> int:
-    """Найти индекс поездки в списке"""
-    for i, trip in enumerate(trips_db):
-        if trip.id == trip_id:
-            return i
-    return -1
+    """Найти поездку по ID (один разбор строки, затем поиск по ключу за O(1))"""
+    key = _parse_trip_id(trip_id)
+
+    if key is None:
+        return None
+
+    return trips_db.get(key)
 
 # ========== ОБРАБОТЧИКИ СОБЫТИЙ ==========
 @app.on_event("startup")
 async def startup_event():
     """Инициализация при запуске приложения"""
+    _setup_logging()
+    FastAPICache.init(InMemoryBackend())
     initialize_database()
-    print(f"✅ Сервис запущен. Загружено {len(trips_db)} поездок.")
+    logger.info("Сервис запущен. Загружено %d поездок.", len(trips_db))
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Очистка при завершении работы"""
-    print("⚠️  Сервис останавливается...")
+    logger.info("Сервис останавливается...")
+
+    if _log_listener is not None:
+        # Дожидаемся, пока слушатель допишет очередь сообщений
+        _log_listener.stop()
 
 # ========== API ENDPOINTS ==========
 
 # 1. КОРНЕВОЙ ЭНДПОИНТ
+# Ответ корневого эндпоинта статичен — собираем словарь один раз при импорте,
+# а не на каждый запрос. Обработчики остаются async def: они не блокируют
+# цикл событий, а sync def стоил бы лишнего прыжка в пул потоков.
+_ROOT_INFO = {
+    "service": "API Туристических поездок",
+    "version": "1.0.0",
+    "author": "Студент (Лабораторная работа №4)",
+    "endpoints": {
+        "get_all_trips": "/trips",
+        "get_trip": "/trips/{id}",
+        "create_trip": "/trips",
+        "update_trip": "/trips/{id}",
+        "patch_trip": "/trips/{id}/patch",
+        "delete_trip": "/trips/{id}",
+        "statistics": "/statistics"
+    },
+    "documentation": {
+        "swagger": "/docs",
+        "redoc": "/redoc"
+    }
+}
+
+# Тело ответа неизменно всё время жизни процесса — сериализуем единожды
+_ROOT_JSON = orjson.dumps(_ROOT_INFO)
+
 @app.get("/", tags=["Информация"])
 async def root():
     """Корневой endpoint с информацией о API"""
-    return {
-        "service": "API Туристических поездок",
-        "version": "1.0.0",
-        "author": "Студент (Лабораторная работа №4)",
-        "endpoints": {
-            "get_all_trips": "/trips",
-            "get_trip": "/trips/{id}",
-            "create_trip": "/trips",
-            "update_trip": "/trips/{id}",
-            "patch_trip": "/trips/{id}/patch",
-            "delete_trip": "/trips/{id}",
-            "statistics": "/statistics"
-        },
-        "documentation": {
-            "swagger": "/docs",
-            "redoc": "/redoc"
-        }
-    }
+    return Response(content=_ROOT_JSON, media_type="application/json")
 
 # 2. ПОЛУЧИТЬ ВСЕ ПОЕЗДКИ (С СОРТИРОВКОЙ)
 @app.get("/trips", response_model=List[Trip], tags=["Поездки"])
+@cache(expire=60, namespace="trips")
 async def get_all_trips(
     sort_by: Optional[str] = Query(
         None,
@@ -179,23 +377,52 @@ async def get_all_trips(
     
     Поддерживает сортировку по любому полю модели.
     """
-    result = trips_db.copy()
-    
-    if sort_by:
-        try:
-            # Пытаемся отсортировать по указанному полю
-            result.sort(
-                key=lambda x: getattr(x, sort_by),
-                reverse=reverse
-            )
-        except AttributeError:
-            # Если поле не существует, возвращаем без сортировки
-            pass
-    
-    return result
+    # Неизвестное поле — возвращаем без сортировки, без try/except
+    if sort_by not in _SORTABLE_FIELDS:
+        return list(trips_db.values())
+
+    view = _sorted_views.get((sort_by, reverse))
+
+    if view is None:
+        view = list(trips_db.values())
+        # attrgetter реализован на C и быстрее lambda с getattr
+        view.sort(key=attrgetter(sort_by), reverse=reverse)
+        _sorted_views[(sort_by, reverse)] = view
+
+    return view
+
+# 3. ПОИСК ПОЕЗДОК ПО ПАРАМЕТРАМ
+# Важно: объявлен раньше "/trips/{trip_id}", иначе слово "search"
+# было бы принято динамическим маршрутом за идентификатор поездки
+@app.get("/trips/search", response_model=List[Trip], tags=["Поиск"])
+@cache(expire=60, namespace="trips")
+async def search_trips(
+    destination: Optional[str] = Query(None, description="Место назначения"),
+    country: Optional[str] = Query(None, description="Страна"),
+    min_price: Optional[float] = Query(None, description="Минимальная цена"),
+    max_price: Optional[float] = Query(None, description="Максимальная цена"),
+    min_rating: Optional[float] = Query(None, description="Минимальный рейтинг")
+):
+    """Поиск поездок по различным критериям"""
+    # Инварианты цикла выносим наружу: регистр параметров понижаем один раз,
+    # глобальный кэш привязываем к локальному имени
+    destination_lc = destination.lower() if destination else None
+    country_lc = country.lower() if country else None
+    search_lc = _search_lc
+
+    # Все фильтры за один проход по базе, без промежуточных списков
+    return [
+        t for key, t in trips_db.items()
+        if (destination_lc is None or destination_lc in search_lc[key][0])
+        and (country_lc is None or country_lc in search_lc[key][1])
+        and (min_price is None or t.price >= min_price)
+        and (max_price is None or t.price <= max_price)
+        and (min_rating is None or t.rating >= min_rating)
+    ]
 
-# 3. ПОЛУЧИТЬ ПОЕЗДКУ ПО ID
+# 4. ПОЛУЧИТЬ ПОЕЗДКУ ПО ID
 @app.get("/trips/{trip_id}", response_model=Trip, tags=["Поездки"])
+@cache(expire=60, namespace="trips")
 async def get_trip(trip_id: str):
     """Получить информацию о конкретной поездке по её ID"""
     trip = find_trip_by_id(trip_id)
@@ -208,7 +435,7 @@ async def get_trip(trip_id: str):
     
     return trip
 
-# 4. СОЗДАТЬ НОВУЮ ПОЕЗДКУ
+# 5. СОЗДАТЬ НОВУЮ ПОЕЗДКУ
 @app.post("/trips", 
           response_model=Trip, 
           status_code=status.HTTP_201_CREATED,
@@ -220,7 +447,7 @@ async def create_trip(trip: Trip):
     ID будет сгенерирован автоматически.
     """
     # Генерируем уникальный ID
-    trip_id = str(uuid.uuid4())
+    trip_id = str(uuid4())
     now = get_current_time()
     
     # Устанавливаем служебные поля
@@ -229,11 +456,12 @@ async def create_trip(trip: Trip):
     trip.updated_at = now
     
     # Добавляем в базу данных
-    trips_db.append(trip)
-    
+    _store_trip(trip)
+    await _invalidate_response_cache()
+
     return trip
 
-# 5. ПОЛНОСТЬЮ ОБНОВИТЬ ПОЕЗДКУ (PUT)
+# 6. ПОЛНОСТЬЮ ОБНОВИТЬ ПОЕЗДКУ (PUT)
 @app.put("/trips/{trip_id}", response_model=Trip, tags=["Поездки"])
 async def update_trip(trip_id: str, updated_trip: Trip):
     """
@@ -242,84 +470,80 @@ async def update_trip(trip_id: str, updated_trip: Trip):
     Заменяет все поля поездки на новые значения.
     Требует отправки всех полей модели.
     """
-    trip_index = find_trip_index(trip_id)
-    
-    if trip_index == -1:
+    original_trip = find_trip_by_id(trip_id)
+
+    if original_trip is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Поездка с ID '{trip_id}' не найдена"
         )
-    
-    # Сохраняем оригинальные даты создания
-    original_trip = trips_db[trip_index]
-    
-    # Обновляем данные
+
+    # Обновляем данные (даты создания сохраняем оригинальные)
     updated_trip.id = trip_id
     updated_trip.created_at = original_trip.created_at
     updated_trip.updated_at = get_current_time()
-    
+
     # Заменяем в базе данных
-    trips_db[trip_index] = updated_trip
-    
+    _store_trip(updated_trip)
+    await _invalidate_response_cache()
+
     return updated_trip
 
-# 6. ЧАСТИЧНО ОБНОВИТЬ ПОЕЗДКУ (PATCH)
+# 7. ЧАСТИЧНО ОБНОВИТЬ ПОЕЗДКУ (PATCH)
 @app.patch("/trips/{trip_id}", response_model=Trip, tags=["Поездки"])
-async def patch_trip(trip_id: str, trip_update: dict):
+async def patch_trip(trip_id: str, trip_update: TripPatch):
     """
     Частично обновить информацию о поездке (PATCH).
-    
+
     Позволяет обновлять только указанные поля.
     Не требует отправки всех полей модели.
     """
-    trip_index = find_trip_index(trip_id)
-    
-    if trip_index == -1:
+    current_trip = find_trip_by_id(trip_id)
+
+    if current_trip is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Поездка с ID '{trip_id}' не найдена"
         )
-    
-    # Получаем текущую поездку
-    current_trip = trips_db[trip_index]
-    trip_dict = current_trip.dict()
-    
-    # Обновляем только указанные поля
-    for key, value in trip_update.items():
-        if key in trip_dict and key not in ['id', 'created_at']:
-            trip_dict[key] = value
-    
+
+    # exclude_unset оставляет только поля, реально присланные клиентом;
+    # exclude_none отбрасывает явные null — все поля модели обязательные,
+    # и null означает "не менять", а не "записать None"
+    updates = trip_update.model_dump(exclude_unset=True, exclude_none=True)
+
     # Обновляем дату изменения
-    trip_dict['updated_at'] = get_current_time()
-    
-    # Создаем обновленный объект
-    updated_trip = Trip(**trip_dict)
-    trips_db[trip_index] = updated_trip
-    
+    updates['updated_at'] = get_current_time()
+
+    # model_copy обновляет копию без повторной валидации всей модели
+    updated_trip = current_trip.model_copy(update=updates)
+    _store_trip(updated_trip)
+    await _invalidate_response_cache()
+
     return updated_trip
 
-# 7. УДАЛИТЬ ПОЕЗДКУ
+# 8. УДАЛИТЬ ПОЕЗДКУ
 @app.delete("/trips/{trip_id}", tags=["Поездки"])
 async def delete_trip(trip_id: str):
     """Удалить поездку по её ID"""
-    trip_index = find_trip_index(trip_id)
-    
-    if trip_index == -1:
+    # Удаляем из базы данных
+    deleted_trip = _remove_trip(trip_id)
+
+    if deleted_trip is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Поездка с ID '{trip_id}' не найдена"
         )
-    
-    # Удаляем из базы данных
-    deleted_trip = trips_db.pop(trip_index)
-    
+
+    await _invalidate_response_cache()
+
     return {
         "message": "Поездка успешно удалена",
         "deleted_trip": deleted_trip.dict()
     }
 
-# 8. СТАТИСТИКА ПО ЧИСЛОВЫМ ПОЛЯМ
+# 9. СТАТИСТИКА ПО ЧИСЛОВЫМ ПОЛЯМ
 @app.get("/statistics", tags=["Статистика"])
+@cache(expire=60, namespace="trips")
 async def get_statistics():
     """
     Получить статистику по числовым полям.
@@ -333,21 +557,18 @@ async def get_statistics():
             "trip_count": 0
         }
     
-    # Определяем числовые поля
-    numeric_fields = ['duration_days', 'price', 'rating', 'group_size']
     statistics = {}
-    
-    for field in numeric_fields:
-        # Собираем значения для каждого поля
-        values = [getattr(trip, field) for trip in trips_db]
-        
-        # Вычисляем статистику
+
+    for field in _NUMERIC_FIELDS:
+        # Векторизованные редукции NumPy по заполненной части колонки
+        values = _cols[field][:_cols_len]
+        total = values.sum()
         statistics[field] = {
-            "min": min(values),
-            "max": max(values),
-            "average": round(sum(values) / len(values), 2),
-            "sum": sum(values),
-            "count": len(values)
+            "min": values.min().item(),
+            "max": values.max().item(),
+            "average": round(float(total) / _cols_len, 2),
+            "sum": total.item(),
+            "count": _cols_len
         }
     
     return {
@@ -356,36 +577,6 @@ async def get_statistics():
         "calculated_at": get_current_time()
     }
 
-# 9. ПОИСК ПОЕЗДОК ПО ПАРАМЕТРАМ
-@app.get("/trips/search", response_model=List[Trip], tags=["Поиск"])
-async def search_trips(
-    destination: Optional[str] = Query(None, description="Место назначения"),
-    country: Optional[str] = Query(None, description="Страна"),
-    min_price: Optional[float] = Query(None, description="Минимальная цена"),
-    max_price: Optional[float] = Query(None, description="Максимальная цена"),
-    min_rating: Optional[float] = Query(None, description="Минимальный рейтинг")
-):
-    """Поиск поездок по различным критериям"""
-    results = trips_db.copy()
-    
-    # Применяем фильтры
-    if destination:
-        results = [t for t in results if destination.lower() in t.destination.lower()]
-    
-    if country:
-        results = [t for t in results if country.lower() in t.country.lower()]
-    
-    if min_price is not None:
-        results = [t for t in results if t.price >= min_price]
-    
-    if max_price is not None:
-        results = [t for t in results if t.price <= max_price]
-    
-    if min_rating is not None:
-        results = [t for t in results if t.rating >= min_rating]
-    
-    return results
-
 # 10. ИНФОРМАЦИЯ О ЗДОРОВЬЕ СЕРВИСА
 @app.get("/health", tags=["Система"])
 async def health_check():
@@ -401,12 +592,15 @@ async def health_check():
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Обработчик HTTP исключений"""
-    return {
-        "error": exc.detail,
-        "status_code": exc.status_code,
-        "path": request.url.path,
-        "timestamp": get_current_time()
-    }
+    return ORJSONResponse(
+        status_code=exc.status_code,
+        content={
+            "error": exc.detail,
+            "status_code": exc.status_code,
+            "path": request.url.path,
+            "timestamp": get_current_time()
+        }
+    )
 
 # ========== ЗАПУСК СЕРВЕРА ==========
 if __name__ == "__main__":